@@ -0,0 +1,316 @@
+"""Shared setup for the Warbler test suite."""
+
+# run the tests like:
+#
+#    python -m pytest
+#
+# or, spread across CPUs:
+#
+#    python -m pytest -n auto
+
+import hashlib
+import os
+from unittest import TestCase
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+# BEFORE we import our app, let's set an environmental variable
+# to use a different database for tests (we need to do this
+# before we import our app, since that will have already
+# connected to the database.
+#
+# Under pytest-xdist each worker gets its own database (warbler-test-gw0,
+# warbler-test-gw1, ...) so workers never see each other's rows
+
+XDIST_WORKER = os.environ.get('PYTEST_XDIST_WORKER')
+
+os.environ['DATABASE_URL'] = (
+    f"postgresql:///warbler-test-{XDIST_WORKER}" if XDIST_WORKER
+    else "postgresql:///warbler-test")
+
+# Hash test passwords with bcrypt's minimum work factor (4 rounds instead
+# of 12 is 256x less hashing); nothing here needs real password security
+
+os.environ['BCRYPT_LOG_ROUNDS'] = "4"
+
+
+# Now we can import app
+
+from app import app
+from models import db
+
+# Run the app in testing mode, so errors in views raise in the test rather
+# than turning into a 500 page, and don't have WTForms use CSRF at all,
+# since it's a pain to test. (bcrypt's work factor can't be set here: it's
+# read from BCRYPT_LOG_ROUNDS above, when the app is imported)
+
+app.config['TESTING'] = True
+app.config['WTF_CSRF_ENABLED'] = False
+
+TEST_DB_URL = make_url(os.environ['DATABASE_URL'])
+TEMPLATE_DB_NAME = "warbler_test_template"
+
+
+def admin_engine():
+    """Engine on the `postgres` maintenance DB, for CREATE/DROP DATABASE."""
+
+    return create_engine(TEST_DB_URL.set(database="postgres"),
+                         isolation_level="AUTOCOMMIT")
+
+
+def schema_fingerprint():
+    """Hash of the DDL `db.metadata.create_all()` would run on PostgreSQL."""
+
+    dialect = postgresql.dialect()
+    ddl = [str(CreateTable(table).compile(dialect=dialect))
+           for table in db.metadata.sorted_tables]
+    ddl += [str(CreateIndex(index).compile(dialect=dialect))
+            for table in db.metadata.sorted_tables
+            for index in sorted(table.indexes, key=lambda index: index.name)]
+
+    return hashlib.sha1("\n".join(ddl).encode()).hexdigest()
+
+
+def pytest_addoption(parser):
+    """Add --build-template, to force a fresh template database."""
+
+    parser.addoption(
+        "--build-template", action="store_true",
+        help="rebuild the test template database, even if its schema is current")
+
+
+def pytest_configure(config):
+    """Build the schema once into a template database.
+
+    Cloning a template is a file-level copy, so each test database gets
+    its tables without re-running CREATE TABLE. The template is stamped
+    with a fingerprint of the models' schema and kept between runs; it's
+    only rebuilt when the models change (or with --build-template). This
+    runs in the main pytest process only, before any xdist workers start,
+    so they all clone the same finished template.
+    """
+
+    if hasattr(config, "workerinput"):
+        return
+
+    fingerprint = schema_fingerprint()
+    admin = admin_engine()
+
+    with admin.connect() as conn:
+        template_row = conn.execute(
+            text("SELECT shobj_description(oid, 'pg_database') AS fingerprint "
+                 "FROM pg_database WHERE datname = :name"),
+            {"name": TEMPLATE_DB_NAME}).first()
+        exists = template_row is not None
+
+        if (exists and template_row.fingerprint == fingerprint
+                and not config.getoption("build_template")):
+            admin.dispose()
+            return
+
+        if exists:
+            conn.execute(text(
+                f'ALTER DATABASE "{TEMPLATE_DB_NAME}" WITH IS_TEMPLATE FALSE'))
+        conn.execute(text(f'DROP DATABASE IF EXISTS "{TEMPLATE_DB_NAME}"'))
+        conn.execute(text(f'CREATE DATABASE "{TEMPLATE_DB_NAME}"'))
+
+    template = create_engine(TEST_DB_URL.set(database=TEMPLATE_DB_NAME))
+    db.metadata.create_all(template)
+    template.dispose()
+
+    with admin.connect() as conn:
+        conn.execute(text(
+            f'ALTER DATABASE "{TEMPLATE_DB_NAME}" WITH IS_TEMPLATE TRUE'))
+        conn.execute(text(
+            f"COMMENT ON DATABASE \"{TEMPLATE_DB_NAME}\" IS '{fingerprint}'"))
+
+    admin.dispose()
+
+
+@pytest.fixture(scope="session")
+def test_db():
+    """Clone the template into the test database and hold one connection to it.
+
+    Every test in the run goes through this single connection: db.session
+    is bound to it for the whole session, so there's no pool checkout or
+    reconnect per test. Test classes take their outer transaction and
+    per-test savepoints on `db.session.get_bind()`.
+    """
+
+    admin = admin_engine()
+
+    with admin.connect() as conn:
+        conn.execute(text(f'DROP DATABASE IF EXISTS "{TEST_DB_URL.database}"'))
+        conn.execute(text(f'CREATE DATABASE "{TEST_DB_URL.database}" '
+                          f'TEMPLATE "{TEMPLATE_DB_NAME}"'))
+        # Don't wait for the WAL fsync on COMMIT, in any connection to the
+        # test database. A crash could lose the last few commits, which is
+        # fine for throwaway test data -- never do this to a real database
+        conn.execute(text(f'ALTER DATABASE "{TEST_DB_URL.database}" '
+                          f'SET synchronous_commit = off'))
+
+    admin.dispose()
+
+    # The app built its engine at import time, before we could pass it any
+    # options, so the tests get their own: a single connection that is never
+    # pre-pinged
+    engine = create_engine(
+        TEST_DB_URL,
+        poolclass=StaticPool,
+        pool_pre_ping=False)
+    connection = engine.connect()
+
+    # Flask-SQLAlchemy's session always picks the app's engine, ignoring a
+    # session-level bind, so swap in a plain session bound to our connection.
+    # Commits here only release a savepoint, so there's nothing to gain from
+    # expiring every loaded object (and re-SELECTing it on next access).
+    # Autoflush is off too; tests that need pending changes to reach the
+    # database before a query call db.session.flush() themselves.
+    app_session = db.session
+    db.session = scoped_session(sessionmaker(
+        bind=connection,
+        join_transaction_mode="create_savepoint",
+        expire_on_commit=False,
+        autoflush=False))
+
+    yield connection
+
+    db.session.remove()
+    db.session = app_session
+    connection.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def truncate_db(test_db):
+    """Empty every table after the test, for tests that need a real COMMIT.
+
+    Savepoint rollback is how test classes normally stay isolated; use this
+    instead for a test whose data has to actually be committed. It's one
+    TRUNCATE for all tables rather than a DELETE per table.
+
+    Only for standalone test functions: it can't be combined with db_session
+    or used in a WarblerTestCase, since its COMMIT would end their outer
+    transaction and wipe the data they share.
+    """
+
+    if test_db.in_transaction():
+        pytest.fail("truncate_db can't run inside an outer transaction "
+                    "(db_session / WarblerTestCase)")
+
+    yield
+
+    tables = ", ".join(table.name for table in db.metadata.sorted_tables)
+
+    db.session.remove()
+    test_db.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+    test_db.commit()
+
+
+@pytest.fixture(scope="module")
+def module_transaction(test_db):
+    """Outer transaction for a module of pytest-style tests.
+
+    Data made by module-scoped fixtures lives here and is thrown away once
+    the module's tests are done.
+    """
+
+    transaction = test_db.begin()
+
+    yield test_db
+
+    db.session.remove()
+    transaction.rollback()
+
+
+@pytest.fixture
+def db_session(module_transaction):
+    """Run the test inside a SAVEPOINT that is rolled back afterwards."""
+
+    savepoint = module_transaction.begin_nested()
+
+    yield db.session
+
+    db.session.close()
+    savepoint.rollback()
+
+
+@pytest.fixture
+def queries(test_db):
+    """List of every SQL statement run on the test connection during the test.
+
+    Clear it just before the request under test, then check its length to
+    put a ceiling on how many queries a page takes.
+    """
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(test_db, "before_cursor_execute", record)
+
+    yield statements
+
+    event.remove(test_db, "before_cursor_execute", record)
+
+
+@pytest.fixture(scope="module")
+def module_client():
+    """One Flask test client, shared by a module's tests."""
+
+    return app.test_client()
+
+
+@pytest.fixture
+def client(module_client):
+    """The module's test client, with its cookies cleared so it starts logged out."""
+
+    module_client.cookie_jar.clear()
+
+    return module_client
+
+
+@pytest.mark.usefixtures("test_db")
+class WarblerTestCase(TestCase):
+    """Base class for Warbler test cases.
+
+    Each class runs inside one outer transaction on the shared connection
+    and each test inside a SAVEPOINT, so nothing the tests (or the views
+    they hit) commit ever leaves it. Subclasses that add their own
+    setUp/setUpClass must call super() first.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Open the class's outer transaction and create its test client."""
+
+        cls.connection = db.session.get_bind()
+        cls.transaction = cls.connection.begin()
+
+        cls.client = app.test_client()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Throw away the outer transaction."""
+
+        db.session.remove()
+        cls.transaction.rollback()
+
+    def setUp(self):
+        """Open a savepoint for this test and start it logged out."""
+
+        self.savepoint = self.connection.begin_nested()
+        self.client.cookie_jar.clear()
+
+    def tearDown(self):
+        """Roll back everything this test wrote."""
+
+        db.session.close()
+        self.savepoint.rollback()
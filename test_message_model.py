@@ -1,62 +1,51 @@
 """Message model tests."""
 
-import os
-from unittest import TestCase
-
-from models import db, User, Message, Follows
 from datetime import datetime
 
-# BEFORE we import our app, let's set an environmental variable
-# to use a different database for tests (we need to do this
-# before we import our app, since that will have already
-# connected to the database
-
-os.environ['DATABASE_URL'] = "postgresql:///warbler-test"
-
-
-# Now we can import app
+from sqlalchemy import func
 
-from app import app
-
-# Create our tables (we do this here, so we only create the tables
-# once for all tests --- in each test, we'll delete the data
-# and create fresh new clean test data
-
-db.create_all()
+from conftest import WarblerTestCase
+from models import db, User, Message
 
 USER_DATA_1 = { "email": "one@test.com",
             "username": "testuser1",
             "password": "HASHED_PASSWORD_1"}
-MSG_1 = Message(text="TEST MESSAGE 1")
-MSG_2 = Message(text="TEST MESSAGE 2")
-MSG_3 = Message(text="TEST MESSAGE 3")
-MSG_4 = Message(text="TEST MESSAGE 4")
 # Generate timestamp for equality validation
 MSG_TIMESTAMP = datetime.utcnow()
 
 
-class UserModelTestCase(TestCase):
-    """Test views for messages."""
+def _mk_msgs(n):
+    """Make `n` fresh (unsaved) messages, so no instance outlives its test."""
 
-    def setUp(self):
-        """Create test client, add sample data."""
+    return [Message(text=f"TEST MESSAGE {i + 1}") for i in range(n)]
 
-        User.query.delete()
-        Message.query.delete()
-        Follows.query.delete()
 
-        self.client = app.test_client()
-        
-    # def tearDown(self):
-    #     '''Clean up any transactions'''
-    #     db.session.rollback()
+def _msg_count(u):
+    """How many messages `u` has in the DB (a COUNT, not a collection load)."""
+
+    return (db.session
+            .query(func.count(Message.id))
+            .filter(Message.user_id == u.id)
+            .scalar())
+
+
+def _has_msg(u, m):
+    """Is `m` one of `u`'s messages in the DB? (an EXISTS query)"""
+
+    return db.session.query(
+        Message.query.filter_by(id=m.id, user_id=u.id).exists()).scalar()
+
+
+class UserModelTestCase(WarblerTestCase):
+    """Test views for messages."""
 
     def test_user_message(self):
         """Does basic model work?"""
 
         u = User(**USER_DATA_1)
         db.session.add(u)
-        db.session.commit()
+        # Flush (no COMMIT) to get u.id; tearDown rolls it all back
+        db.session.flush()
 
         m = Message(
             text = "Test Message 1" ,
@@ -64,7 +53,7 @@ class UserModelTestCase(TestCase):
             user_id = u.id
             )
         db.session.add(m)
-        db.session.commit()
+        db.session.flush()
         
         self.assertEqual(m.user, u)
         self.assertEqual(len(u.messages), 1)
@@ -74,14 +63,14 @@ class UserModelTestCase(TestCase):
         
         u = User(**USER_DATA_1)
         db.session.add(u)
-        db.session.commit()
+        db.session.flush()
 
-        m = MSG_1
+        [m] = _mk_msgs(1)
         # Check the message is NOT in u.messages
         self.assertNotIn(m, u.messages)
 
         u.messages.append(m)
-        db.session.commit()
+        db.session.flush()
         # Check the message IS in u.messages
         self.assertIn(m, u.messages)
     
@@ -90,70 +79,60 @@ class UserModelTestCase(TestCase):
         
         u = User(**USER_DATA_1)
         db.session.add(u)
-        db.session.commit()
+        db.session.flush()
 
-        m1 = MSG_1
-        m2 = MSG_2
-        m3 = MSG_3
-        m4 = MSG_4
+        m1, m2, m3, m4 = _mk_msgs(4)
 
-        # Check the message are NOT in u.messages
-        self.assertEqual(len(u.messages), 0)
-        self.assertNotIn(m1, u.messages)
-        self.assertNotIn(m2, u.messages)
-        self.assertNotIn(m3, u.messages)
-        self.assertNotIn(m4, u.messages)
+        # Check the messages are NOT in u.messages
+        self.assertEqual(_msg_count(u), 0)
 
         u.messages.append(m1)
         u.messages.append(m2)
         u.messages.append(m3)
         u.messages.append(m4)
-        db.session.commit()
+        db.session.flush()
 
         # Check the messages ARE in u.messages
-        self.assertEqual(len(u.messages), 4)
-        self.assertIn(m1, u.messages)
-        self.assertIn(m2, u.messages)
-        self.assertIn(m3, u.messages)
-        self.assertIn(m4, u.messages)
+        self.assertEqual(_msg_count(u), 4)
+        self.assertTrue(_has_msg(u, m1))
+        self.assertTrue(_has_msg(u, m2))
+        self.assertTrue(_has_msg(u, m3))
+        self.assertTrue(_has_msg(u, m4))
     
     def test_delete_message(self):
         """Does a message get deleted properly"""
         
         u = User(**USER_DATA_1)
         db.session.add(u)
-        db.session.commit()
+        db.session.flush()
 
-        m1 = MSG_1
-        m2 = MSG_2
-        m3 = MSG_3
-        m4 = MSG_4
+        m1, m2, m3, m4 = _mk_msgs(4)
 
-        self.assertEqual(len(u.messages), 0)
+        self.assertEqual(_msg_count(u), 0)
 
         u.messages.append(m1)
         u.messages.append(m2)
         u.messages.append(m3)
         u.messages.append(m4)
-        db.session.commit()
+        db.session.flush()
 
-        self.assertEqual(len(u.messages), 4)
+        self.assertEqual(_msg_count(u), 4)
 
         # Delete message 1
         db.session.delete(m1)
-        db.session.commit()
+        db.session.flush()
 
-        self.assertNotIn(m1, u.messages)
-        self.assertEqual(len(u.messages), 3)
+        self.assertFalse(_has_msg(u, m1))
+        self.assertEqual(_msg_count(u), 3)
         
         # Delete messages 3 & 4
         db.session.delete(m3)
         db.session.delete(m4)
-        db.session.commit()
+        db.session.flush()
         
-        self.assertNotIn(m3, u.messages)
-        self.assertNotIn(m4, u.messages)
-        self.assertEqual(len(u.messages), 1)
+        self.assertFalse(_has_msg(u, m3))
+        self.assertFalse(_has_msg(u, m4))
+        self.assertEqual(_msg_count(u), 1)
         
         # Check the last message is still there
-        self.assertIn(m2, u.messages)
+        self.assertTrue(_has_msg(u, m2))
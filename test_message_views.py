@@ -2,55 +2,34 @@
 
 # run these tests like:
 #
-#    FLASK_ENV=production python -m unittest test_message_views.py
+#    python -m pytest test_message_views.py
 
 
-import os
-from unittest import TestCase
+from unittest.mock import patch
 
-from models import db, connect_db, Message, User, Likes
+from app import CURR_USER_KEY
+from conftest import WarblerTestCase
+from models import db, Message, User, Likes
 
-# BEFORE we import our app, let's set an environmental variable
-# to use a different database for tests (we need to do this
-# before we import our app, since that will have already
-# connected to the database
 
-os.environ['DATABASE_URL'] = "postgresql:///warbler-test"
-
-
-# Now we can import app
-
-from app import app, CURR_USER_KEY
-
-# Create our tables (we do this here, so we only create the tables
-# once for all tests --- in each test, we'll delete the data
-# and create fresh new clean test data
-
-db.create_all()
-
-# Don't have WTForms use CSRF at all, since it's a pain to test
-
-app.config['WTF_CSRF_ENABLED'] = False
-
-
-class MessageViewTestCase(TestCase):
+class MessageViewTestCase(WarblerTestCase):
     """Test views for messages."""
 
-    def setUp(self):
-        """Create test client, add sample data."""
+    @classmethod
+    def setUpClass(cls):
+        """Sign up the user the tests log in as, once for the class."""
 
-        User.query.delete()
-        Message.query.delete()
-
-        self.client = app.test_client()
-
-        self.testuser = User.signup(username="testuser",
-                                    email="test@test.com",
-                                    password="testuser",
-                                    image_url=None)
+        super().setUpClass()
 
+        testuser = User.signup(username="testuser",
+                               email="test@test.com",
+                               password="testuser",
+                               image_url=None)
         db.session.commit()
 
+        cls.testuser_id = testuser.id
+        db.session.close()
+
     def test_messages_add(self):
         """Can user add a message?"""
 
@@ -59,14 +38,16 @@ class MessageViewTestCase(TestCase):
 
         with self.client as c:
             with c.session_transaction() as sess:
-                sess[CURR_USER_KEY] = self.testuser.id
+                sess[CURR_USER_KEY] = self.testuser_id
 
             # Now, that session setting is saved, so we can have
             # the rest of ours test
 
-            # GET ROUTE
-            resp_g = c.get("/messages/new")
+            # GET ROUTE (only the status matters, so skip rendering the form)
+            with patch("app.render_template", return_value="") as render:
+                resp_g = c.get("/messages/new")
             self.assertEqual(resp_g.status_code, 200)
+            self.assertEqual(render.call_args.args, ("messages/new.html",))
 
             # POST ROUTE
             resp_p = c.post("/messages/new", data={"text": "Hello"})
@@ -82,7 +63,7 @@ class MessageViewTestCase(TestCase):
 
         with self.client as c:
             with c.session_transaction() as sess:
-                sess[CURR_USER_KEY] = self.testuser.id
+                sess[CURR_USER_KEY] = self.testuser_id
             # Generate a message
             c.post("/messages/new", data={"text": "Hello"})
             # Retrieve message for testing
@@ -99,7 +80,7 @@ class MessageViewTestCase(TestCase):
 
         with self.client as c:
             with c.session_transaction() as sess:
-                sess[CURR_USER_KEY] = self.testuser.id
+                sess[CURR_USER_KEY] = self.testuser_id
             # Generate a message
             c.post("/messages/new", data={"text": "Hello"})
             # Retrieve message for testing
@@ -115,36 +96,37 @@ class MessageViewTestCase(TestCase):
 
         with self.client as c:
             with c.session_transaction() as sess:
-                sess[CURR_USER_KEY] = self.testuser.id
+                sess[CURR_USER_KEY] = self.testuser_id
             # Generate a message
             c.post("/messages/new", data={"text": "Hello"})
             # Retrieve message for testing
             msg = Message.query.one()
             # Like the message
             resp = c.post(f"/users/add_like/{msg.id}")
-            like = Likes.query.one()
+            like_msg_id = db.session.query(Likes.message_id).scalar()
             
             self.assertEqual(resp.status_code, 302)
-            self.assertEqual(msg.id, like.message_id)
+            self.assertEqual(msg.id, like_msg_id)
 
             # Toggling to UN-like
             c.post(f"/users/add_like/{msg.id}")
             # Ensure the single like has been removed
-            self.assertEqual(Likes.query.first(), None)
+            self.assertIsNone(db.session.query(Likes.id).first())
 
     def test_show_likes(self):
         """Does /users/<int:user_id>/likes show only liked posts?"""
 
         with self.client as c:
             with c.session_transaction() as sess:
-                sess[CURR_USER_KEY] = self.testuser.id
-            # Generate a few message
-            c.post("/messages/new", data={"text": "Message 1"})
-            c.post("/messages/new", data={"text": "Message 2"})
-            c.post("/messages/new", data={"text": "Message 3"})
-            c.post("/messages/new", data={"text": "Message 4"})
-
-            all_messages = Message.query.all()
+                sess[CURR_USER_KEY] = self.testuser_id
+            # Generate a few messages (in one batch; posting them isn't
+            # what's under test here)
+            msgs = [Message(text=f"Message {i}", user_id=self.testuser_id)
+                    for i in range(1, 5)]
+            db.session.bulk_save_objects(msgs, return_defaults=True)
+            db.session.commit()
+
+            all_messages = Message.query.order_by(Message.id).all()
             msg_1 = all_messages[0]
             msg_2 = all_messages[1]
             msg_3 = all_messages[2]
@@ -156,8 +138,9 @@ class MessageViewTestCase(TestCase):
             # DONT like msg_3
             resp = c.post(f"/users/add_like/{msg_4.id}")
             
-            resp = c.get(f"/users/{self.testuser.id}/likes")
-            like_msg_ids = {l.message_id for l in Likes.query.all()}
+            resp = c.get(f"/users/{self.testuser_id}/likes")
+            like_msg_ids = {message_id for (message_id,)
+                            in db.session.query(Likes.message_id)}
             
             self.assertEqual(resp.status_code, 200)
             
@@ -2,31 +2,15 @@
 
 # run these tests like:
 #
-#    python -m unittest test_user_model.py
+#    python -m pytest test_user_model.py
 
 
-import os
-from unittest import TestCase
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 
-from models import db, User, Message, Follows
-
-# BEFORE we import our app, let's set an environmental variable
-# to use a different database for tests (we need to do this
-# before we import our app, since that will have already
-# connected to the database
-
-os.environ['DATABASE_URL'] = "postgresql:///warbler-test"
-
-
-# Now we can import app
-
-from app import app
-
-# Create our tables (we do this here, so we only create the tables
-# once for all tests --- in each test, we'll delete the data
-# and create fresh new clean test data
-
-db.create_all()
+from conftest import WarblerTestCase
+from models import db, User, Follows
 
 USER_DATA_1 = { "email": "one@test.com",
             "username": "testuser1",
@@ -37,29 +21,16 @@ USER_DATA_2 = { "email": "two@test.com",
             "password": "HASHED_PASSWORD_2"}
 
 
-class UserModelTestCase(TestCase):
+class UserModelTestCase(WarblerTestCase):
     """Test views for messages."""
 
-    def setUp(self):
-        """Create test client, add sample data."""
-
-        User.query.delete()
-        Message.query.delete()
-        Follows.query.delete()
-
-        self.client = app.test_client()
-        
-    # def tearDown(self):
-    #     '''Clean up any transactions'''
-    #     db.session.rollback()
-
     def test_user_model(self):
         """Does basic model work?"""
 
         u = User(**USER_DATA_1)
 
         db.session.add(u)
-        db.session.commit()
+        db.session.flush()
 
         # User should have no messages & no followers
         self.assertEqual(len(u.messages), 0)
@@ -70,7 +41,7 @@ class UserModelTestCase(TestCase):
 
         u = User(**USER_DATA_1)
         db.session.add(u)
-        db.session.commit()
+        db.session.flush()
 
         rep = f"<User #{u.id}: {u.username}, {u.email}>"
 
@@ -88,7 +59,7 @@ class UserModelTestCase(TestCase):
         user1 = User(**USER_DATA_1)
         user2 = User(**USER_DATA_2)
         db.session.add_all([user1, user2])
-        db.session.commit()
+        db.session.flush()
         
         repr_follows = f"<Follows {user2.id}, {user1.id}>"
 
@@ -97,10 +68,12 @@ class UserModelTestCase(TestCase):
         self.assertNotEqual(str(Follows.query.first()), repr_follows)
         # User1 starts following user2
         user1.following.append(user2)
+        db.session.flush()
         self.assertIn(user2, user1.following)
         self.assertEqual(str(Follows.query.first()), repr_follows)
         # User1 UNfollows user2
         user1.following.remove(user2)
+        db.session.flush()
         self.assertNotIn(user2, user1.following)
         self.assertNotEqual(str(Follows.query.first()), repr_follows)
 
@@ -113,7 +86,7 @@ class UserModelTestCase(TestCase):
         user1 = User(**USER_DATA_1)
         user2 = User(**USER_DATA_2)
         db.session.add_all([user1, user2])
-        db.session.commit()
+        db.session.flush()
 
         repr_follows = f"<Follows {user1.id}, {user2.id}>"
 
@@ -123,11 +96,13 @@ class UserModelTestCase(TestCase):
 
         # User1 starts being followed by user2
         user1.followers.append(user2)
+        db.session.flush()
         self.assertIn(user2, user1.followers)
         self.assertEqual(str(Follows.query.first()), repr_follows)
         
         # User1 STOPS being followed by user2
         user1.followers.remove(user2)
+        db.session.flush()
         self.assertNotIn(user2, user1.followers)
         self.assertNotEqual(str(Follows.query.first()), repr_follows)
 
@@ -145,7 +120,7 @@ class UserModelTestCase(TestCase):
         )
 
         db.session.add(u)
-        db.session.commit()
+        db.session.flush()
 
         self.assertEqual(u, User.query.first())
         self.assertEqual(u.email, t_email)
@@ -170,62 +145,83 @@ class UserModelTestCase(TestCase):
         db.session.add(u0)
         db.session.commit()
         # ------ Bad users ------ 
+        # (plain rows, inserted without building User objects; the test
+        # only cares that each INSERT is rejected)
         # Missing 1 piece of data
-        u1 = User(                  username = g_username, password = g_password )
-        u2 = User( email = g_email,                        password = g_password )
-        u3 = User( email = g_email, username = g_username,                       )
+        u1 = {                  "username": g_username, "password": g_password }
+        u2 = { "email": g_email,                        "password": g_password }
+        u3 = { "email": g_email, "username": g_username,                       }
         # 1 pice of data is None 
-        u4 = User( email = None,    username = g_username, password = g_password )
-        u5 = User( email = g_email, username = None,       password = g_password )
-        u6 = User( email = g_email, username = g_username, password = None       )
+        u4 = { "email": None,    "username": g_username, "password": g_password }
+        u5 = { "email": g_email, "username": None,       "password": g_password }
+        u6 = { "email": g_email, "username": g_username, "password": None       }
         # # Duplicate username    - UNIQUENESS ERROR
-        u7 = User( email = v_email, username = g_username, password = g_password )
+        u7 = { "email": v_email, "username": g_username, "password": g_password }
         # # Duplicate email       - UNIQUENESS ERROR
-        u8 = User( email = g_email, username = v_username, password = g_password )
+        u8 = { "email": g_email, "username": v_username, "password": g_password }
 
         # List of bad users to iterate through attempting to add users
         bad_users = [u1, u2, u3, u4, u5, u6, u7, u8]
         
-        for u in bad_users:
-            with self.assertRaises(ValueError):
-                try:
-                    db.session.add(u)
-                    db.session.commit()
-                except:
-                    db.session.rollback()
-                    # Raise ValueError (did not expect None
-                    # for a given data piece, expected string)
-                    raise ValueError
-            # Should never gain more users beyond 1st valid user
-            self.assertEqual(len(User.query.all()), 1)
-        
+        for i, row in enumerate(bad_users):
+            with self.subTest(i=i):
+                # Roll each attempt back to a SAVEPOINT rather than
+                # ending the whole transaction
+                savepoint = db.session.begin_nested()
+                with self.assertRaises(IntegrityError):
+                    db.session.bulk_insert_mappings(User, [row])
+                savepoint.rollback()
+
+        # Should never gain more users beyond 1st valid user
+        self.assertEqual(len(User.query.all()), 1)
+
+
+class UserAuthenticateTestCase(WarblerTestCase):
+    """Test User.authenticate against a signed-up user."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Sign up the user once for the class."""
+
+        super().setUpClass()
+
+        sig_user = User.signup( "testusername", "testemail@test.net", "TEST_PASSWORD", "" )
+        db.session.commit()
+
+        cls.sig_username = sig_user.username
+        db.session.close()
+
     def test_user_authenticate_good_data(self):
         """
         Does User.authenticate return a valid user
         given a valid username/password
         """
-        # Use signup to get a hashed password (which is in User.authenticate)
-        User.signup( "testusername", "testemail@test.net", "TEST_PASSWORD", "" )
 
         user = User.query.first()
-        self.assertEqual(user, User.authenticate(user.username, "TEST_PASSWORD"))
+        self.assertEqual(user, User.authenticate(self.sig_username, "TEST_PASSWORD"))
     
     def test_user_authenticate_bad_user(self):
         """ Does User.authenticate fail given a valid bad username """
-        # Use signup to get a hashed password (which is in User.authenticate)
-        User.signup( "testusername", "testemail@test.net", "TEST_PASSWORD", "" )
 
-        user = User.query.first()
         # Returns false upon bad authentication
         self.assertFalse(User.authenticate("bad_username", "TEST_PASSWORD"))
 
     def test_user_authenticate_bad_pwd(self):
         """ Does User.authenticate fail given a valid bad username """
-        # Use signup to get a hashed password (which is in User.authenticate)
-        User.signup( "testusername", "testemail@test.net", "TEST_PASSWORD", "" )
 
-        user = User.query.first()
         # Returns false upon bad authentication
-        self.assertFalse(User.authenticate(user.username, "BAD_PASSWORD"))
-        
-        
\ No newline at end of file
+        self.assertFalse(User.authenticate(self.sig_username, "BAD_PASSWORD"))
+
+
+@pytest.mark.usefixtures("truncate_db")
+def test_signup_committed():
+    """Is a signed up user really committed, for other connections to see?"""
+
+    User.signup(**USER_DATA_1, image_url="")
+    db.session.commit()
+
+    # The app's own engine is a separate connection to the test database
+    with db.engine.connect() as conn:
+        usernames = conn.execute(select(User.username)).scalars().all()
+
+    assert usernames == ["testuser1"]
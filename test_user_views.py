@@ -2,439 +2,407 @@
 
 # run these tests like:
 #
-#    FLASK_ENV=production python -m unittest test_message_views.py
+#    python -m pytest test_user_views.py
 
 
-import os
-from unittest import TestCase
+import pytest
+from selectolax.parser import HTMLParser
+from sqlalchemy import insert
 
-from models import db, connect_db, Message, User
+from app import CURR_USER_KEY
+from models import db, bcrypt, Message, User
 
-# BEFORE we import our app, let's set an environmental variable
-# to use a different database for tests (we need to do this
-# before we import our app, since that will have already
-# connected to the database
+# No test here logs in with a password, so rather than bcrypt-hashing one
+# per user through User.signup, every test user shares this one hash
 
-os.environ['DATABASE_URL'] = "postgresql:///warbler-test"
+PASSWORD_HASH = bcrypt.generate_password_hash("testuser").decode("UTF-8")
 
+# Every test runs inside a SAVEPOINT that is rolled back afterwards
+pytestmark = pytest.mark.usefixtures("db_session")
 
-# Now we can import app
+# A following/followers page takes a fixed number of queries: the session's
+# SAVEPOINT, a load for each of the profile header's messages, following,
+# followers and likes counts the test hasn't already loaded, and (on someone
+# else's profile) g.user's following list for the cards' Follow buttons.
+# Each page lists two users, so a query per listed user (N+1) shows up as a
+# changed count
 
-from app import app, CURR_USER_KEY
 
-# Create our tables (we do this here, so we only create the tables
-# once for all tests --- in each test, we'll delete the data
-# and create fresh new clean test data
+def page(resp):
+    """Parse a response's HTML once, to be queried with CSS selectors."""
 
-db.create_all()
+    return HTMLParser(resp.get_data(as_text=True))
 
-# Don't have WTForms use CSRF at all, since it's a pain to test
 
-app.config['WTF_CSRF_ENABLED'] = False
+def texts(html, selector):
+    """The text of every element in a parsed page matching `selector`."""
 
+    return {node.text(strip=True) for node in html.css(selector)}
 
-class UserViewTestCase(TestCase):
-    """Test views for messages."""
 
-    def setUp(self):
-        """Create test client, add sample data."""
+@pytest.fixture(scope="module")
+def user_ids(module_transaction):
+    """Create the test users once for the whole module."""
 
-        User.query.delete()
-        Message.query.delete()
+    # One multi-row INSERT ... RETURNING for all four; "testuser" will be
+    # the logged in user
+    rows = module_transaction.execute(
+        insert(User)
+        .values([{"username": "testuser",
+                  "email": "test@test.com",
+                  "password": PASSWORD_HASH},
+                 {"username": "testuser1",
+                  "email": "test1@test.com",
+                  "password": PASSWORD_HASH},
+                 {"username": "testuser2",
+                  "email": "test2@test.com",
+                  "password": PASSWORD_HASH},
+                 {"username": "testuser3",
+                  "email": "test3@test.com",
+                  "password": PASSWORD_HASH}])
+        .returning(User.username, User.id))
 
-        self.client = app.test_client()
-        
-        # This will be the logged in user
-        self.testuser = User.signup(username="testuser",
-                                    email="test@test.com",
-                                    password="testuser",
-                                    image_url=None)
+    return dict(rows.all())
 
-        self.testuser1 = User.signup(username="testuser1",
-                                    email="test1@test.com",
-                                    password="testuser1",
-                                    image_url=None)
 
-        self.testuser2 = User.signup(username="testuser2",
-                                    email="test2@test.com",
-                                    password="testuser2",
-                                    image_url=None)
-        
+@pytest.fixture
+def users(user_ids, db_session):
+    """The test users, loaded into this test's session."""
 
-        db.session.commit()
-        
-    
-    def test_list_users(self):
-        """
-        Is a list of all users shown
-        functions the same if logged in or not
-        """
+    return {name: db_session.get(User, user_id)
+            for name, user_id in user_ids.items()}
+
+
+@pytest.fixture
+def logged_in_client(client, users):
+    """A test client whose session is logged in as testuser."""
+
+    with client.session_transaction() as sess:
+        sess[CURR_USER_KEY] = users["testuser"].id
+
+    return client
+
+
+def test_users_survive_commit(user_ids, users, queries):
+    """Are the test users still loaded after a commit (no re-SELECT)?
+
+    The test session doesn't expire objects on commit, so the
+    `users['testuser'].id` in every URL below costs no query.
+    """
+
+    users["testuser"].following.append(users["testuser1"])
+    db.session.commit()
+
+    queries.clear()
+
+    assert users["testuser"].id == user_ids["testuser"]
+    assert users["testuser"].username == "testuser"
+    assert users["testuser1"] in users["testuser"].following
+    assert queries == []
+
+
+def test_list_users(logged_in_client, users):
+    """
+    Is a list of all users shown
+    functions the same if logged in or not
+    """
+
+    # No search parameters
+    resp_e = logged_in_client.get("/users")
+    html = page(resp_e)
+    paras = texts(html, "p")
+
+    assert resp_e.status_code == 200
+    # Check that all (2) test users are shown in the HTML
+    assert "@testuser" in paras
+    assert "@testuser1" in paras
+    assert "@testuser2" in paras
+
+    resp_s = logged_in_client.get("/users?q=1")
+    html = page(resp_s)
+    paras = texts(html, "p")
+
+    assert resp_s.status_code == 200
+    # Check that all (2) test users are shown in the HTML
+    assert "@testuser" not in paras
+    assert "@testuser1" in paras
+    assert "@testuser2" not in paras
 
-        with self.client as c:
-            with c.session_transaction() as sess:
-                sess[CURR_USER_KEY] = self.testuser.id
-
-            # No search parameters
-            resp_e = c.get("/users")
-            html = resp_e.get_data(as_text=True)
-
-            self.assertEqual(resp_e.status_code, 200)
-            # Check that all (2) test users are shown in the HTML
-            self.assertIn("<p>@testuser</p>", html)
-            self.assertIn("<p>@testuser1</p>", html)
-            self.assertIn("<p>@testuser2</p>", html)
-            
-            resp_s = c.get("/users?q=1")
-            html = resp_s.get_data(as_text=True)
-
-            self.assertEqual(resp_s.status_code, 200)
-            # Check that all (2) test users are shown in the HTML
-            self.assertNotIn("<p>@testuser</p>", html)
-            self.assertIn("<p>@testuser1</p>", html)
-            self.assertNotIn("<p>@testuser2</p>", html)
 
 ##############################################################################
 # Test routes as a guest (not logged in), most routes deny user access
 
-    def test_users_show_guest(self):
-        """Is a the specified user's profile shown? (guest) """
-
-        with self.client as c:
-
-            # Create a message for testuser1
-            self.testuser1.messages.append(
-                Message(text="I am the first message from testuser1")
-            )
-            # Ensure only messages from testuser1 show up, by creating a message for testuser2
-            self.testuser2.messages.append(
-                Message(text="I am the first message from testuser2")
-            )
-            db.session.commit()
-
-            resp = c.get(f"/users/{self.testuser1.id}")
-            html = resp.get_data(as_text=True)
-
-            self.assertEqual(resp.status_code, 200)
-            
-            # Ensure only messages form this user's profile show up 
-            self.assertIn("<p>I am the first message from testuser1</p>", html)
-            self.assertNotIn("<p>I am the first message from testuser2</p>", html)
-            
-            # Ensure the profile is being viewed as a guest
-            self.assertNotIn('class="btn btn-outline-secondary">Edit Profile', html)
-            self.assertNotIn('<button class="btn btn-primary">Unfollow', html)
-            self.assertNotIn('<button class="btn btn-outline-primary">Follow', html)
-    
-    def test_show_following_guest(self):
-        """Is access denied to view who a user is following? (guest)"""
-
-        with self.client as c:
-            resp = c.get(f"/users/{self.testuser1.id}/following")
-            # Check user is redirected
-            self.assertEqual(resp.status_code, 302)
-
-            # Follow redirects to check that flash message is "Unauthorized"
-            resp = c.get(f"/users/{self.testuser1.id}/following", follow_redirects=True)
-            html = resp.get_data(as_text=True)
-
-            self.assertEqual(resp.status_code, 200)
-            self.assertIn('<div class="alert alert-danger">Access unauthorized.</div>', html)
-            self.assertIn('<li><a href="/signup">Sign up</a></li>', html)
-            self.assertIn('<li><a href="/login">Log in</a></li>', html)
-    
-    def test_users_followers_guest(self):
-        """Is access denied to view a user's followers (guest)"""
-
-        with self.client as c:
-            resp = c.get(f"/users/{self.testuser1.id}/followers")
-            # Check user is redirected
-            self.assertEqual(resp.status_code, 302)
-
-            # Follow redirects to check that flash message is "Unauthorized"
-            resp = c.get(f"/users/{self.testuser1.id}/followers", follow_redirects=True)
-            html = resp.get_data(as_text=True)
-
-            self.assertEqual(resp.status_code, 200)
-            self.assertIn('<div class="alert alert-danger">Access unauthorized.</div>', html)
-            self.assertIn('<li><a href="/signup">Sign up</a></li>', html)
-            self.assertIn('<li><a href="/login">Log in</a></li>', html)
-        
-    def test_add_follow_guest(self):
-        """Is access denied to add a follow (guest)"""
-
-        with self.client as c:
-            resp = c.post(f"/users/follow/{self.testuser1.id}")
-            # Check user is redirected
-            self.assertEqual(resp.status_code, 302)
-
-            # Follow redirects to check that flash message is "Unauthorized"
-            resp = c.post(f"/users/follow/{self.testuser1.id}", follow_redirects=True)
-            html = resp.get_data(as_text=True)
-
-            self.assertEqual(resp.status_code, 200)
-            self.assertIn('<div class="alert alert-danger">Access unauthorized.</div>', html)
-            self.assertIn('<li><a href="/signup">Sign up</a></li>', html)
-            self.assertIn('<li><a href="/login">Log in</a></li>', html)
-
-    def test_stop_following_guest(self):
-        """Is access denied to stop a follow (guest)"""
-
-        with self.client as c:
-            resp = c.post(f"/users/stop-following/{self.testuser1.id}")
-            # Check user is redirected
-            self.assertEqual(resp.status_code, 302)
-
-            # Follow redirects to check that flash message is "Unauthorized"
-            resp = c.post(f"/users/stop-following/{self.testuser1.id}", follow_redirects=True)
-            html = resp.get_data(as_text=True)
-
-            self.assertEqual(resp.status_code, 200)
-            self.assertIn('<div class="alert alert-danger">Access unauthorized.</div>', html)
-            self.assertIn('<li><a href="/signup">Sign up</a></li>', html)
-            self.assertIn('<li><a href="/login">Log in</a></li>', html)
-        
-    def test_profile_guest(self):
-        """Is access denied to update a user's profile (guest)"""
-
-        with self.client as c:
-            resp = c.post("/users/profile")
-            # Check user is redirected
-            self.assertEqual(resp.status_code, 302)
-
-            # Follow redirects to check that flash message is "Unauthorized"
-            resp = c.post("/users/profile", follow_redirects=True)
-            html = resp.get_data(as_text=True)
-
-            self.assertEqual(resp.status_code, 200)
-            self.assertIn('<div class="alert alert-danger">Access unauthorized.</div>', html)
-            self.assertIn('<li><a href="/signup">Sign up</a></li>', html)
-            self.assertIn('<li><a href="/login">Log in</a></li>', html)
-        
-    def test_delete_user_guest(self):
-        """Is access denied to delete a user (guest)"""
-
-        with self.client as c:
-            resp = c.post("/users/delete")
-            # Check user is redirected
-            self.assertEqual(resp.status_code, 302)
-
-            # Follow redirects to check that flash message is "Unauthorized"
-            resp = c.post("/users/delete", follow_redirects=True)
-            html = resp.get_data(as_text=True)
-
-            self.assertEqual(resp.status_code, 200)
-            self.assertIn('<div class="alert alert-danger">Access unauthorized.</div>', html)
-            self.assertIn('<li><a href="/signup">Sign up</a></li>', html)
-            self.assertIn('<li><a href="/login">Log in</a></li>', html)
-        
+
+def test_users_show_guest(client, users):
+    """Is a the specified user's profile shown? (guest) """
+
+    # Create a message for testuser1
+    db.session.add(Message(text="I am the first message from testuser1",
+                           user_id=users["testuser1"].id))
+    # Ensure only messages from testuser1 show up, by creating a message for testuser2
+    db.session.add(Message(text="I am the first message from testuser2",
+                           user_id=users["testuser2"].id))
+    db.session.commit()
+
+    resp = client.get(f"/users/{users['testuser1'].id}")
+    html = page(resp)
+    paras = texts(html, "p")
+    profile_buttons = texts(html, ".user-stats .btn")
+
+    assert resp.status_code == 200
+
+    # Ensure only messages form this user's profile show up 
+    assert "I am the first message from testuser1" in paras
+    assert "I am the first message from testuser2" not in paras
+
+    # Ensure the profile is being viewed as a guest
+    assert "Edit Profile" not in profile_buttons
+    assert "Unfollow" not in profile_buttons
+    assert "Follow" not in profile_buttons
+
+
+@pytest.mark.parametrize("method,url", [
+    ("GET", "/users/{id}/following"),
+    ("GET", "/users/{id}/followers"),
+    ("POST", "/users/follow/{id}"),
+    ("POST", "/users/stop-following/{id}"),
+    ("POST", "/users/profile"),
+    ("POST", "/users/delete"),
+])
+def test_guest_denied(client, users, method, url):
+    """Is access denied to a logged in only route? (guest)"""
+
+    resp = client.open(url.format(id=users["testuser1"].id), method=method)
+
+    # Check user is redirected home
+    assert resp.status_code == 302
+    assert resp.location == "/"
+
+    # Check the flash message waiting for the home page is "Unauthorized"
+    with client.session_transaction() as sess:
+        flashes = sess.get("_flashes", [])
+
+    assert ("danger", "Access unauthorized.") in flashes
+
+
 ##############################################################################
 # Test routes as a logged in user
-            
-    def test_users_show_logged_in_other_profile(self):
+
+
+@pytest.fixture(scope="class")
+def profile_messages(user_ids, module_transaction):
+    """Give each test user one message, for a whole class of tests.
+
+    The messages go in a savepoint of their own, rolled back once the
+    class is done, so tests outside the class never see them.
+    """
+
+    savepoint = module_transaction.begin_nested()
+
+    module_transaction.execute(insert(Message).values([
+        # A message for testuser
+        {"text": "I am logged in and messaging!",
+         "user_id": user_ids["testuser"]},
+        # A message for testuser1
+        {"text": "I am the first message from testuser1",
+         "user_id": user_ids["testuser1"]},
+        # Ensure only the profile's messages show up, with one for testuser2
+        {"text": "I am the first message from testuser2",
+         "user_id": user_ids["testuser2"]},
+    ]))
+
+    yield
+
+    savepoint.rollback()
+
+
+@pytest.mark.usefixtures("profile_messages")
+class TestUsersShowLoggedIn:
+    """Profile pages viewed by the logged in testuser, sharing one message per user."""
+
+    def test_users_show_logged_in_other_profile(self, logged_in_client, users):
         """.
         Is a the specified user's profile shown? (logged in)
         [NOT SELF PROFILE]
         """
 
-        with self.client as c:
-            with c.session_transaction() as sess:
-                sess[CURR_USER_KEY] = self.testuser.id
-            # Create a message for testuser
-            self.testuser.messages.append(
-                Message(text="I am logged in and messaging!")
-            )
-
-            # Create a message for testuser1
-            self.testuser1.messages.append(
-                Message(text="I am the first message from testuser1")
-            )
-            # Ensure only messages from testuser1 show up, by creating a message for testuser2
-            self.testuser2.messages.append(
-                Message(text="I am the first message from testuser2")
-            )
-            db.session.commit()
-
-            # View someone else's profile
-            resp = c.get(f"/users/{self.testuser1.id}")
-            html = resp.get_data(as_text=True)
-
-            self.assertEqual(resp.status_code, 200)
-            
-            # Ensure only messages form this user's profile show up 
-            self.assertIn("<p>I am the first message from testuser1</p>", html)
-            self.assertNotIn("<p>I am logged in and messaging!</p>", html)
-            self.assertNotIn("<p>I am the first message from testuser2</p>", html)
-            
-            # Ensure the profile is being viewed as a guest
-            self.assertNotIn('class="btn btn-outline-secondary">Edit Profile', html)
-            self.assertNotIn('<button class="btn btn-primary">Unfollow', html)
-            self.assertIn('<button class="btn btn-outline-primary">Follow', html)
-
-    def test_users_show_logged_in_self_profile(self):
+        # View someone else's profile
+        resp = logged_in_client.get(f"/users/{users['testuser1'].id}")
+        html = page(resp)
+        paras = texts(html, "p")
+        profile_buttons = texts(html, ".user-stats .btn")
+
+        assert resp.status_code == 200
+
+        # Ensure only messages form this user's profile show up 
+        assert "I am the first message from testuser1" in paras
+        assert "I am logged in and messaging!" not in paras
+        assert "I am the first message from testuser2" not in paras
+
+        # Ensure the profile is being viewed as a guest
+        assert "Edit Profile" not in profile_buttons
+        assert "Unfollow" not in profile_buttons
+        assert "Follow" in profile_buttons
+
+    def test_users_show_logged_in_self_profile(self, logged_in_client, users):
         """.
         Is a the specified user's profile shown? (logged in)
         [NOT SELF PROFILE]
         """
 
-        with self.client as c:
-            with c.session_transaction() as sess:
-                sess[CURR_USER_KEY] = self.testuser.id
-            # Create a message for testuser
-            self.testuser.messages.append(
-                Message(text="I am logged in and messaging!")
-            )
-
-            # Create a message for testuser1
-            self.testuser1.messages.append(
-                Message(text="I am the first message from testuser1")
-            )
-            # Ensure only messages from testuser1 show up, by creating a message for testuser2
-            self.testuser2.messages.append(
-                Message(text="I am the first message from testuser2")
-            )
-            db.session.commit()
-
-            # View logged in user's profile
-            resp = c.get(f"/users/{self.testuser.id}")
-            html = resp.get_data(as_text=True)
-
-            self.assertEqual(resp.status_code, 200)
-            
-            # Ensure only messages form this user's profile show up 
-            self.assertIn("<p>I am logged in and messaging!</p>", html)
-            self.assertNotIn("<p>I am the first message from testuser1</p>", html)
-            self.assertNotIn("<p>I am the first message from testuser2</p>", html)
-            
-            # Ensure the profile is being viewed as a logged in user
-            self.assertIn('class="btn btn-outline-secondary">Edit Profile', html)
-            self.assertNotIn('<button class="btn btn-primary">Unfollow', html)
-            self.assertNotIn('<button class="btn btn-outline-primary">Follow', html)
-    
-    def test_show_following_logged_in_other_profile(self):
-        """Is users the another in user is following shown? (logged in)"""
-
-        with self.client as c:
-            with c.session_transaction() as sess:
-                sess[CURR_USER_KEY] = self.testuser.id
-
-            # Follow testuser1, but not testuser2
-            self.testuser1.following.append(self.testuser2)
-            db.session.commit()
-            
-            resp = c.get(f"/users/{self.testuser1.id}/following")
-            html = resp.get_data(as_text=True)
-
-            self.assertEqual(resp.status_code, 200)
-
-            self.assertNotIn('class="btn btn-outline-secondary">Edit Profile', html)
-
-            self.assertIn("<p>@testuser2</p>", html)
-            self.assertNotIn("<p>@testuser</p>", html)
-
-            self.assertIn('<button class="btn btn-outline-primary btn-sm">Follow</button>', html)
-            self.assertNotIn('<button class="btn btn-primary btn-sm">Unfollow</button>', html)
-
-    def test_show_following_logged_in_self(self):
-        """Is users the logged in user is following shown? (logged in)"""
-
-        with self.client as c:
-            with c.session_transaction() as sess:
-                sess[CURR_USER_KEY] = self.testuser.id
-
-            # Follow testuser1, but not testuser2
-            self.testuser.following.append(self.testuser1)
-            db.session.commit()
-            
-            resp = c.get(f"/users/{self.testuser.id}/following")
-            html = resp.get_data(as_text=True)
-
-            self.assertEqual(resp.status_code, 200)
-
-            self.assertIn('class="btn btn-outline-secondary">Edit Profile', html)
-
-            self.assertIn("<p>@testuser1</p>", html)
-            self.assertNotIn("<p>@testuser2</p>", html)
-
-            self.assertIn('<button class="btn btn-primary btn-sm">Unfollow</button>', html)
-    
-    def test_users_followers_logged_in_other_profile(self):
-        """Is the logged in user's followers shown? (logged in)"""
-
-        with self.client as c:
-            with c.session_transaction() as sess:
-                sess[CURR_USER_KEY] = self.testuser.id
-            
-            
-            self.testuser1.followers.append(self.testuser2)
-            db.session.commit()
-
-            resp = c.get(f"/users/{self.testuser1.id}/followers")
-            html = resp.get_data(as_text=True)
-            
-            self.assertEqual(resp.status_code, 200)
-
-            self.assertNotIn('class="btn btn-outline-secondary">Edit Profile', html)
-
-            self.assertIn("<p>@testuser2</p>", html)
-            self.assertNotIn("<p>@testuser</p>", html)
-
-            self.assertIn('<button class="btn btn-outline-primary btn-sm">Follow</button>', html)
-
-    def test_users_followers_logged_in_self(self):
-        """Is the logged in user's followers shown? (logged in)"""
-
-        with self.client as c:
-            with c.session_transaction() as sess:
-                sess[CURR_USER_KEY] = self.testuser.id
-            
-            
-            self.testuser.followers.append(self.testuser2)
-            db.session.commit()
-
-            resp = c.get(f"/users/{self.testuser.id}/followers")
-            html = resp.get_data(as_text=True)
-            
-            self.assertEqual(resp.status_code, 200)
-
-            self.assertIn('class="btn btn-outline-secondary">Edit Profile', html)
-
-            self.assertIn("<p>@testuser2</p>", html)
-            self.assertNotIn("<p>@testuser1</p>", html)
-
-            self.assertIn('<button class="btn btn-outline-primary btn-sm">Follow</button>', html)
-     
-    def test_add_follow_logged_in(self):
-        """Can logged in user follow someone (logged in)"""
-
-        with self.client as c:
-            with c.session_transaction() as sess:
-                sess[CURR_USER_KEY] = self.testuser.id
+        # View logged in user's profile
+        resp = logged_in_client.get(f"/users/{users['testuser'].id}")
+        html = page(resp)
+        paras = texts(html, "p")
+        profile_buttons = texts(html, ".user-stats .btn")
+
+        assert resp.status_code == 200
+
+        # Ensure only messages form this user's profile show up 
+        assert "I am logged in and messaging!" in paras
+        assert "I am the first message from testuser1" not in paras
+        assert "I am the first message from testuser2" not in paras
+
+        # Ensure the profile is being viewed as a logged in user
+        assert "Edit Profile" in profile_buttons
+        assert "Unfollow" not in profile_buttons
+        assert "Follow" not in profile_buttons
+
+
+def test_show_following_logged_in_other_profile(logged_in_client, users, queries):
+    """Is users the another in user is following shown? (logged in)"""
+
+    # testuser1 follows testuser2 and testuser3, but not testuser
+    users["testuser1"].following.extend([users["testuser2"], users["testuser3"]])
+    db.session.commit()
+
+    queries.clear()
+    resp = logged_in_client.get(f"/users/{users['testuser1'].id}/following")
+    html = page(resp)
+    paras = texts(html, "p")
+    profile_buttons = texts(html, ".user-stats .btn")
+    card_buttons = texts(html, ".user-card .btn")
+
+    assert resp.status_code == 200
+    # SAVEPOINT, the header's messages, followers and likes, g.user.following
+    assert len(queries) == 5
+
+    assert "Edit Profile" not in profile_buttons
+
+    assert "@testuser2" in paras
+    assert "@testuser3" in paras
+    assert "@testuser" not in paras
+
+    assert "Follow" in card_buttons
+    assert "Unfollow" not in card_buttons
+
+
+def test_show_following_logged_in_self(logged_in_client, users, queries):
+    """Is users the logged in user is following shown? (logged in)"""
+
+    # Follow testuser1 and testuser3, but not testuser2
+    users["testuser"].following.extend([users["testuser1"], users["testuser3"]])
+    db.session.commit()
+
+    queries.clear()
+    resp = logged_in_client.get(f"/users/{users['testuser'].id}/following")
+    html = page(resp)
+    paras = texts(html, "p")
+    profile_buttons = texts(html, ".user-stats .btn")
+    card_buttons = texts(html, ".user-card .btn")
+
+    assert resp.status_code == 200
+    # SAVEPOINT, the header's messages, followers and likes (the following
+    # list, which the cards check too, was loaded by the extend above)
+    assert len(queries) == 4
+
+    assert "Edit Profile" in profile_buttons
+
+    assert "@testuser1" in paras
+    assert "@testuser3" in paras
+    assert "@testuser2" not in paras
+
+    assert "Unfollow" in card_buttons
+
+
+def test_users_followers_logged_in_other_profile(logged_in_client, users, queries):
+    """Is the logged in user's followers shown? (logged in)"""
+
+    # testuser2 and testuser3 follow testuser1, testuser doesn't
+    users["testuser1"].followers.extend([users["testuser2"], users["testuser3"]])
+    db.session.commit()
+
+    queries.clear()
+    resp = logged_in_client.get(f"/users/{users['testuser1'].id}/followers")
+    html = page(resp)
+    paras = texts(html, "p")
+    profile_buttons = texts(html, ".user-stats .btn")
+    card_buttons = texts(html, ".user-card .btn")
+
+    assert resp.status_code == 200
+    # SAVEPOINT, the header's messages, following and likes, g.user.following
+    assert len(queries) == 5
+
+    assert "Edit Profile" not in profile_buttons
+
+    assert "@testuser2" in paras
+    assert "@testuser3" in paras
+    assert "@testuser" not in paras
+
+    assert "Follow" in card_buttons
+
+
+def test_users_followers_logged_in_self(logged_in_client, users, queries):
+    """Is the logged in user's followers shown? (logged in)"""
+
+    # testuser2 and testuser3 follow testuser, testuser1 doesn't
+    users["testuser"].followers.extend([users["testuser2"], users["testuser3"]])
+    db.session.commit()
+
+    queries.clear()
+    resp = logged_in_client.get(f"/users/{users['testuser'].id}/followers")
+    html = page(resp)
+    paras = texts(html, "p")
+    profile_buttons = texts(html, ".user-stats .btn")
+    card_buttons = texts(html, ".user-card .btn")
+
+    assert resp.status_code == 200
+    # SAVEPOINT, the header's messages, following and likes (the cards
+    # reuse that same following list)
+    assert len(queries) == 4
+
+    assert "Edit Profile" in profile_buttons
+
+    assert "@testuser2" in paras
+    assert "@testuser3" in paras
+    assert "@testuser1" not in paras
+
+    assert "Follow" in card_buttons
+
+
+def test_add_follow_logged_in(logged_in_client, users):
+    """Can logged in user follow someone (logged in)"""
 
-            resp = c.post(f"/users/follow/{self.testuser1.id}")
-            html = resp.get_data(as_text=True)
+    resp = logged_in_client.post(f"/users/follow/{users['testuser1'].id}")
 
-            # Check we are redirected
-            self.assertEqual(resp.status_code, 302)
-            # Check the testuser1 has successfully been followed
-            self.assertIn(self.testuser1, self.testuser.following)
-            self.assertEqual(len(self.testuser.following), 1)
+    # Check we are redirected
+    assert resp.status_code == 302
+    # Check the testuser1 has successfully been followed
+    assert users["testuser1"] in users["testuser"].following
+    assert len(users["testuser"].following) == 1
 
-    def test_stop_following_logged_in(self):
-        """Can logged in user un-follow another user (logged in)"""
 
-        with self.client as c:
-            with c.session_transaction() as sess:
-                sess[CURR_USER_KEY] = self.testuser.id
+def test_stop_following_logged_in(logged_in_client, users):
+    """Can logged in user un-follow another user (logged in)"""
 
-            # Logged in user follows testuser1, should work if
-            # test_add_follow_logged_in() succeeded
-            c.post(f"/users/follow/{self.testuser1.id}")
-            
-            # Logged in user UN-follows testuser1
-            resp = c.post(f"/users/stop-following/{self.testuser1.id}")
+    # Logged in user follows testuser1, should work if
+    # test_add_follow_logged_in() succeeded
+    logged_in_client.post(f"/users/follow/{users['testuser1'].id}")
 
-            self.assertEqual(resp.status_code, 302)
-            # Check the testuser1 has successfully been UN-followed
-            self.assertNotIn(self.testuser1, self.testuser.following)
-            self.assertEqual(len(self.testuser.following), 0)
+    # Logged in user UN-follows testuser1
+    resp = logged_in_client.post(f"/users/stop-following/{users['testuser1'].id}")
 
+    assert resp.status_code == 302
+    # Check the testuser1 has successfully been UN-followed
+    assert users["testuser1"] not in users["testuser"].following
+    assert len(users["testuser"].following) == 0